@@ -1,19 +1,33 @@
 import os
 import json
+import hashlib
+import logging
 import uuid
 import asyncio
+import io
 import re
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from enum import Enum
 
-from fastapi import FastAPI, WebSocket, HTTPException, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, field_validator
 import google.generativeai as genai
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Integer, JSON
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy import create_engine, event, func, inspect, not_, or_, text, Column, String, DateTime, Text, Integer, JSON, Index, ForeignKey
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import declarative_base, sessionmaker, validates, Session
 import redis
+import redis.asyncio as aioredis
+import anyio
+from arq import create_pool
+from arq.connections import RedisSettings
+import orjson
 from dotenv import load_dotenv
 
 
@@ -55,13 +69,51 @@ print(f"🔧 Using database: {DATABASE_URL}")
 engine = create_engine(
     DATABASE_URL, 
     connect_args={"check_same_thread": False},
-    echo=True  # This will show SQL queries for debugging
+    # Reuse connections across requests and agent phases instead of
+    # reconnecting; sized for concurrent builds plus API traffic and
+    # tunable per deployment
+    pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_timeout=30,
+    # Hand back the most recently used connection so its page cache is warm
+    pool_use_lifo=True,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    insertmanyvalues_page_size=1000,
+    # JSON columns (log/project metadata, shared memory values) via orjson
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads,
+    # SQL statement logging is opt-in; set SQL_ECHO=1 to debug queries
+    echo=os.getenv("SQL_ECHO") == "1"
 )
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_connection, _connection_record):
+    """WAL + relaxed fsync so the many small agent commits stay cheap"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    # SQLite leaves foreign keys unenforced (and ON DELETE CASCADE inert) by default
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# "arq" hands builds to separate `arq main.WorkerSettings` processes;
+# otherwise they run as background tasks of the API worker
+BUILD_QUEUE = os.getenv("BUILD_QUEUE", "")
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+def get_db():
+    """FastAPI dependency that yields a pooled session per request"""
+    with SessionLocal() as db:
+        yield db
+
 class Project(Base):
     __tablename__ = "projects"
     
@@ -74,22 +126,35 @@ class Project(Base):
     # Changed from 'metadata' to 'project_metadata'
     project_metadata = Column(JSON, default=dict)
 
+def normalize_file_path(path: str) -> str:
+    """Stored file paths always start with /, so "a" and "/a" are one file"""
+    return path if path.startswith('/') else '/' + path
+
 class ProjectFile(Base):
     __tablename__ = "project_files"
+    __table_args__ = (
+        Index("ix_pf_project_path", "project_id", "file_path", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    project_id = Column(String, nullable=False)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     file_path = Column(String, nullable=False)
     content = Column(Text)
-    size = Column(Integer)
+    # Lets upserts skip rewriting files an agent regenerated unchanged
+    content_sha256 = Column(String(64))
+    # Size is derived with length(content) when read; older databases keep an unused size column
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @validates("file_path")
+    def _normalize_file_path(self, _key, path):
+        return normalize_file_path(path)
 
 class AgentLog(Base):
     __tablename__ = "agent_logs"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    project_id = Column(String, nullable=False)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     agent_name = Column(String, nullable=False)
     level = Column(String, default="info")
     message = Column(Text)
@@ -97,18 +162,74 @@ class AgentLog(Base):
     log_metadata = Column(JSON, default=dict)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Serves get_logs' "newest 100 for a project" as an index range scan
+Index("ix_log_project_time", AgentLog.project_id, AgentLog.created_at.desc())
+
 class SharedMemory(Base):
     __tablename__ = "shared_memory"
+    __table_args__ = (
+        Index("ix_sm_project_key", "project_id", "key", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    project_id = Column(String, nullable=False)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     key = Column(String, nullable=False)
     value = Column(JSON)
+    # Role that wrote the key; used to scope which memory each agent sees
+    agent_name = Column(String)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+def add_missing_columns():
+    """Add nullable columns introduced since an existing database was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+
+def build_upsert(table, index_elements: List[str], update_columns: List[str],
+                 unless_equal: Optional[str] = None):
+    """Core INSERT ... ON CONFLICT DO UPDATE, executed with a list of rows (executemany)
+
+    With unless_equal, conflicting rows whose value in that column already
+    matches the incoming one are left untouched.
+    """
+    stmt = sqlite_insert(table)
+    where = None
+    if unless_equal:
+        where = table.c[unless_equal].is_distinct_from(stmt.excluded[unless_equal])
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={col: stmt.excluded[col] for col in update_columns},
+        where=where
+    )
+
+def content_digest(content: Any) -> str:
+    return hashlib.sha256(str(content).encode()).hexdigest()
+
+# Agent write paths skip the ORM unit of work and go straight through Core
+SHARED_MEMORY_UPSERT = build_upsert(
+    SharedMemory.__table__, ["project_id", "key"], ["value", "agent_name", "updated_at"]
+)
+PROJECT_FILE_UPSERT = build_upsert(
+    ProjectFile.__table__, ["project_id", "file_path"],
+    ["content", "content_sha256", "updated_at"], unless_equal="content_sha256"
+)
+
 # Create tables
 try:
     Base.metadata.create_all(engine)
+    add_missing_columns()
+    # create_all skips indexes on tables that already exist, and the upserts
+    # below need the unique ones, so add any that are missing
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
     print("✅ Database tables created successfully")
 except Exception as e:
     print(f"❌ Database error: {e}")
@@ -126,39 +247,362 @@ except Exception as e:
 # ============================================
 
 try:
-    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    redis_pool = redis.ConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=50,
+        socket_keepalive=True,
+        retry_on_timeout=True,
+        decode_responses=True
+    )
+    redis_client = redis.Redis(connection_pool=redis_pool)
     redis_client.ping()
     print("✅ Redis connected successfully")
 except Exception as e:
     print(f"⚠️ Redis connection failed: {e}")
     redis_client = None
 
+# Async client for WebSocket subscribers, which must not block the event loop
+redis_async = aioredis.from_url(REDIS_URL, decode_responses=True) if redis_client else None
+
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
 
+# Shared memory is cached per project as a Redis hash (one field per key) so
+# concurrent agents can merge their updates without overwriting each other.
+# The sentinel field marks a complete copy; a hash without it is only a
+# partial write and is treated as a miss.
+MEMORY_CACHE_TTL = 3600
+MEMORY_CACHE_SENTINEL = "__loaded__"
+
+# Past this size the memory block in a prompt is partly summarized
+MEMORY_PROMPT_BUDGET = 8192
+# Longest serialized value a single memory entry may contribute
+MEMORY_VALUE_LIMIT = 2000
+
+def memory_cache_key(project_id: str) -> str:
+    return f"proj:{project_id}:mem"
+
+def load_shared_memory(db: Session, project_id: str) -> dict:
+    """Get a project's shared memory as {key: (agent_name, value)}, from Redis when cached"""
+    key = memory_cache_key(project_id)
+    if redis_client:
+        try:
+            cached = redis_client.hgetall(key)
+            if cached.pop(MEMORY_CACHE_SENTINEL, None) is not None:
+                return {k: tuple(orjson.loads(v)) for k, v in cached.items()}
+        except redis.RedisError as e:
+            print(f"⚠️ Redis cache read failed: {e}")
+    
+    shared_memory = db.query(SharedMemory).filter_by(project_id=project_id).all()
+    memory = {sm.key: (sm.agent_name, sm.value) for sm in shared_memory}
+    
+    if redis_client:
+        try:
+            # HSETNX: an agent may have committed and cached a newer value
+            # since the query above, which this snapshot must not overwrite
+            pipe = redis_client.pipeline()
+            for k, v in memory.items():
+                pipe.hsetnx(key, k, orjson.dumps(v))
+            pipe.hset(key, MEMORY_CACHE_SENTINEL, "1")
+            pipe.expire(key, MEMORY_CACHE_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"⚠️ Redis cache write failed: {e}")
+    
+    return memory
+
+def update_shared_memory_cache(project_id: str, agent_name: str, updates: dict):
+    """Merge committed shared memory updates into the cached copy"""
+    if not redis_client or not updates:
+        return
+    key = memory_cache_key(project_id)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(key, mapping={k: orjson.dumps([agent_name, v]) for k, v in updates.items()})
+        pipe.expire(key, MEMORY_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"⚠️ Redis cache write failed: {e}")
+
+def format_shared_memory(memory_dict: dict) -> str:
+    """Serialize shared memory for a prompt, summarizing entries past the budget"""
+    # Truncate oversized values so one entry can't crowd out the rest
+    entries = []
+    for key, value in memory_dict.items():
+        value_json = orjson.dumps(value).decode()
+        if len(value_json) > MEMORY_VALUE_LIMIT:
+            value = value_json[:MEMORY_VALUE_LIMIT] + "…"
+            value_json = orjson.dumps(value).decode()
+        entries.append((key, value, value_json))
+    
+    memory_json = orjson.dumps({key: value for key, value, _ in entries}).decode()
+    if len(memory_json) <= MEMORY_PROMPT_BUDGET:
+        return memory_json
+    
+    # Keep entries whole while they fit and list the rest as one-liners
+    kept, summaries, used = {}, [], 0
+    for key, value, value_json in entries:
+        if used + len(key) + len(value_json) <= MEMORY_PROMPT_BUDGET:
+            kept[key] = value
+            used += len(key) + len(value_json)
+        else:
+            summaries.append(f"{key}: {value_json[:120]}... ({len(value_json)} chars)")
+    
+    return orjson.dumps(kept).decode() + "\nSUMMARIZED ENTRIES:\n" + "\n".join(summaries)
+
+def project_channel(project_id: str) -> str:
+    return f"proj:{project_id}:events"
+
+def publish_event(project_id: str, event: dict):
+    """Push an event to WebSocket subscribers of a project"""
+    if not redis_client:
+        return
+    try:
+        redis_client.publish(project_channel(project_id), orjson.dumps(event))
+    except redis.RedisError as e:
+        print(f"⚠️ Redis publish failed: {e}")
+
+def log_event(log: AgentLog) -> dict:
+    """Event payload for a log row, matching the get_logs entries"""
+    return {
+        "type": "log",
+        "timestamp": log.created_at,
+        "agent": log.agent_name,
+        "level": log.level,
+        "message": log.message
+    }
+
+# Orchestrator log lines go through a queue drained by one background task,
+# which inserts a batch (up to LOG_BATCH_SIZE rows collected over at most
+# LOG_FLUSH_INTERVAL seconds) per commit. The queue is bounded so a stalled
+# database applies backpressure instead of growing memory.
+LOG_BATCH_SIZE = 200
+LOG_FLUSH_INTERVAL = 0.1
+LOG_QUEUE_SIZE = 10000
+log_queue: Optional[asyncio.Queue] = None
+log_writer_task: Optional[asyncio.Task] = None
+
+def write_logs(logs: List[AgentLog]):
+    """Insert a batch of logs in one transaction, then publish their events
+
+    If the batch is rejected (a log for a project that no longer exists),
+    the rows are retried one by one so only the offending ones are dropped.
+    """
+    events = [(log.project_id, log_event(log)) for log in logs]
+    with SessionLocal() as db:
+        try:
+            db.add_all(logs)
+            db.commit()
+            written = events
+        except IntegrityError:
+            db.rollback()
+            written = []
+            for log, event in zip(logs, events):
+                db.add(log)
+                try:
+                    db.commit()
+                    written.append(event)
+                except IntegrityError as e:
+                    db.rollback()
+                    print(f"⚠️ Dropped log for project {log.project_id}: {e.orig}")
+    for project_id, event in written:
+        publish_event(project_id, event)
+
+async def drain_log_queue():
+    """Write queued logs in batches until the None sentinel arrives
+
+    A Future in the queue is a flush request (see flush_log_queue): the
+    batch so far is written right away and the Future resolved.
+    """
+    loop = asyncio.get_running_loop()
+    running = True
+    while running:
+        item = await log_queue.get()
+        if item is None:
+            break
+        batch = []
+        flushed = None
+        deadline = loop.time() + LOG_FLUSH_INTERVAL
+        while True:
+            if isinstance(item, asyncio.Future):
+                flushed = item
+                break
+            batch.append(item)
+            timeout = deadline - loop.time()
+            if len(batch) >= LOG_BATCH_SIZE or timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(log_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                running = False
+                break
+        if batch:
+            try:
+                await asyncio.to_thread(write_logs, batch)
+            except Exception as e:
+                print(f"⚠️ Failed to write {len(batch)} log(s): {e}")
+        if flushed and not flushed.done():
+            flushed.set_result(None)
+    
+    # Anything queued behind the sentinel while shutting down
+    remaining = []
+    waiters = []
+    while not log_queue.empty():
+        item = log_queue.get_nowait()
+        if isinstance(item, asyncio.Future):
+            waiters.append(item)
+        elif item is not None:
+            remaining.append(item)
+    if remaining:
+        await asyncio.to_thread(write_logs, remaining)
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+async def start_log_writer(ctx=None):
+    global log_queue, log_writer_task
+    # Created here so the queue belongs to the loop that drains it
+    log_queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+    log_writer_task = asyncio.create_task(drain_log_queue())
+
+async def stop_log_writer(ctx=None):
+    """Flush pending logs and stop the writer"""
+    # A sentinel rather than cancel(): the writer finishes its current batch
+    await log_queue.put(None)
+    await log_writer_task
+
+def log_writer_running() -> bool:
+    """Whether a background writer drains the queue on the current loop"""
+    return bool(log_writer_task and not log_writer_task.done()
+                and log_writer_task.get_loop() is asyncio.get_running_loop())
+
+async def enqueue_log(log: AgentLog):
+    """Queue a log for the background writer, or write it now if none is running"""
+    if log_writer_running():
+        await log_queue.put(log)
+    else:
+        await asyncio.to_thread(write_logs, [log])
+
+async def flush_log_queue():
+    """Wait until every log queued so far has been written"""
+    if log_writer_running():
+        flushed = asyncio.get_running_loop().create_future()
+        await log_queue.put(flushed)
+        await flushed
+
+# Per-project agent status, shared by all workers
+AGENT_STATUS_TTL = 86400
+
+def agent_status_key(project_id: str) -> str:
+    return f"agent_status:{project_id}"
+
+def set_agent_status(project_id: str, agent_name: str, status: str):
+    if not redis_client:
+        return
+    key = agent_status_key(project_id)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(key, agent_name, status)
+        pipe.expire(key, AGENT_STATUS_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"⚠️ Redis status write failed: {e}")
+
+# Read-heavy GET responses (the UI polls them during a build) are cached in
+# one hash per project and generation. Writers bump the generation whenever
+# the project's files or status change rather than deleting the hash: a
+# reader takes the key before querying the DB, so a body it read before a
+# write lands in the old generation's hash, which nothing reads again.
+RESPONSE_CACHE_TTL = 300
+
+def response_generation_key(project_id: str) -> str:
+    # No TTL: if it lapsed, the counter could climb back to a generation
+    # that a slow reader had just refilled with stale data
+    return f"proj:{project_id}:responses:gen"
+
+def response_cache_key(project_id: str) -> Optional[str]:
+    """Key of the current generation's hash; take it before reading the DB"""
+    if not redis_client:
+        return None
+    try:
+        generation = redis_client.get(response_generation_key(project_id)) or "0"
+    except redis.RedisError as e:
+        print(f"⚠️ Redis cache read failed: {e}")
+        return None
+    return f"proj:{project_id}:responses:{generation}"
+
+def get_cached_response(key: Optional[str], field: str) -> Optional[str]:
+    if not key:
+        return None
+    try:
+        return redis_client.hget(key, field)
+    except redis.RedisError as e:
+        print(f"⚠️ Redis cache read failed: {e}")
+        return None
+
+def cache_response(key: Optional[str], fields: Dict[str, Any]):
+    if not key:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, RESPONSE_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"⚠️ Redis cache write failed: {e}")
+
+def invalidate_response_cache(project_id: str):
+    if not redis_client:
+        return
+    try:
+        redis_client.incr(response_generation_key(project_id))
+    except redis.RedisError as e:
+        print(f"⚠️ Redis cache invalidation failed: {e}")
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+def iter_chunks(content: str, size: int = FILE_CHUNK_SIZE):
+    """Yield a file body in fixed-size slices for streaming responses"""
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+# orjson has no raw_decode, so the trailing-text fallback keeps the stdlib decoder
+_json_decoder = json.JSONDecoder()
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*")
+
 def extract_json_from_text(text: str) -> dict:
     """Extract JSON from text that may contain markdown or other content"""
     try:
         # Try direct parse first
-        return json.loads(text)
+        return orjson.loads(text)
     except:
         pass
     
+    # Common case: one object wrapped in a fence or a line of prose, so
+    # parse the outermost braces before falling back to any regex work
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    if 0 <= start < end:
+        try:
+            return orjson.loads(text[start:end])
+        except orjson.JSONDecodeError:
+            pass
+    
     # Remove markdown code blocks
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```\s*', '', text)
+    text = _JSON_FENCE_RE.sub('', text)
     
-    # Find JSON object
+    # Decode the first complete JSON object in one pass, ignoring any
+    # trailing text (which may itself contain stray braces)
     json_start = text.find('{')
-    json_end = text.rfind('}') + 1
-    
-    if json_start >= 0 and json_end > json_start:
-        json_str = text[json_start:json_end]
+    while json_start >= 0:
         try:
-            return json.loads(json_str)
-        except:
-            pass
+            result, _ = _json_decoder.raw_decode(text, json_start)
+            return result
+        except ValueError:
+            json_start = text.find('{', json_start + 1)
     
     # Return minimal structure if parsing fails
     return {
@@ -168,6 +612,53 @@ def extract_json_from_text(text: str) -> dict:
         "next_steps": []
     }
 
+class JsonStreamScanner:
+    """Accumulates streamed text and spots where the first JSON object ends"""
+    
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.pos = 0
+        self.start = -1
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk; True once a complete, valid JSON object has been seen"""
+        self.buffer.write(chunk)
+        for ch in chunk:
+            pos = self.pos
+            self.pos += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth:
+                self.in_string = True
+            elif ch == '{':
+                if self.depth == 0:
+                    self.start = pos
+                self.depth += 1
+            elif ch == '}' and self.depth:
+                self.depth -= 1
+                # Braces in leading prose can balance too, so confirm it parses
+                if self.depth == 0 and self._parses(self.start, pos + 1):
+                    return True
+        return False
+    
+    def _parses(self, start: int, end: int) -> bool:
+        try:
+            orjson.loads(self.buffer.getvalue()[start:end])
+            return True
+        except ValueError:
+            return False
+    
+    def getvalue(self) -> str:
+        return self.buffer.getvalue()
+
 # ============================================
 # MODELS
 # ============================================
@@ -186,6 +677,30 @@ class AgentRole(str, Enum):
     DOCUMENTATION_SPECIALIST = "DocumentationSpecialist"
     UX_DESIGNER = "UXDesigner"
 
+# Roles whose shared memory each agent reads; roles not listed see everything.
+# Keys written before producers were tracked (agent_name NULL) go to everyone.
+MEMORY_SOURCES = {
+    AgentRole.PRODUCT_MANAGER: set(),
+    AgentRole.UX_DESIGNER: {AgentRole.PRODUCT_MANAGER},
+    AgentRole.SYSTEM_ARCHITECT: {AgentRole.PRODUCT_MANAGER},
+    AgentRole.DATABASE_ENGINEER: {AgentRole.PRODUCT_MANAGER, AgentRole.SYSTEM_ARCHITECT},
+    AgentRole.BACKEND_ENGINEER: {AgentRole.PRODUCT_MANAGER, AgentRole.SYSTEM_ARCHITECT,
+                                 AgentRole.DATABASE_ENGINEER},
+    AgentRole.FRONTEND_ENGINEER: {AgentRole.PRODUCT_MANAGER, AgentRole.UX_DESIGNER,
+                                  AgentRole.SYSTEM_ARCHITECT, AgentRole.BACKEND_ENGINEER},
+    AgentRole.MOBILE_ENGINEER: {AgentRole.PRODUCT_MANAGER, AgentRole.UX_DESIGNER,
+                                AgentRole.SYSTEM_ARCHITECT, AgentRole.BACKEND_ENGINEER},
+    AgentRole.ML_ENGINEER: {AgentRole.PRODUCT_MANAGER, AgentRole.SYSTEM_ARCHITECT,
+                            AgentRole.DATABASE_ENGINEER},
+    AgentRole.SECURITY_ENGINEER: {AgentRole.SYSTEM_ARCHITECT, AgentRole.DATABASE_ENGINEER,
+                                  AgentRole.BACKEND_ENGINEER, AgentRole.FRONTEND_ENGINEER},
+    AgentRole.QA_ENGINEER: {AgentRole.PRODUCT_MANAGER, AgentRole.SYSTEM_ARCHITECT,
+                            AgentRole.BACKEND_ENGINEER, AgentRole.FRONTEND_ENGINEER},
+    AgentRole.DEVOPS_ENGINEER: {AgentRole.SYSTEM_ARCHITECT, AgentRole.DATABASE_ENGINEER,
+                                AgentRole.BACKEND_ENGINEER, AgentRole.FRONTEND_ENGINEER,
+                                AgentRole.SECURITY_ENGINEER, AgentRole.QA_ENGINEER},
+}
+
 class ProjectCreate(BaseModel):
     name: str
     description: str
@@ -193,6 +708,11 @@ class ProjectCreate(BaseModel):
 class FileCreate(BaseModel):
     path: str
     content: str
+    
+    @field_validator("path")
+    @classmethod
+    def _normalize_path(cls, path: str) -> str:
+        return normalize_file_path(path)
 
 class TaskResult(BaseModel):
     success: bool
@@ -204,31 +724,71 @@ class TaskResult(BaseModel):
 # AGENT SYSTEM
 # ============================================
 
+# One Gemini model shared by every agent. The role's system prompt travels in
+# each request's prompt, so nothing about the client is agent-specific.
+# Initialize Gemini only if API key is available
+if GEMINI_API_KEY:
+    genai.configure(api_key=GEMINI_API_KEY)
+    SHARED_MODEL = genai.GenerativeModel(
+        'gemini-2.0-flash',
+        generation_config={
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": 8192,
+            # JSON mode: the reply is the bare object, with no fences or prose
+            "response_mime_type": "application/json",
+        }
+    )
+else:
+    SHARED_MODEL = None
+
+# Static tail of every agent prompt
+RESPONSE_FORMAT_INSTRUCTIONS = """
+
+CRITICAL: Respond with ONLY a valid JSON object in this EXACT format:
+{
+    "reasoning": "your detailed thought process and approach",
+    "output": "your main deliverable (description, code, design, etc)",
+    "files": {
+        "/path/to/file.ext": "complete file content here"
+    },
+    "shared_memory_updates": {
+        "key_name": "value to share with team"
+    },
+    "next_steps": ["recommended next step"],
+    "blockers": []
+}
+
+Generate complete, production-ready code. No placeholders, no TODOs."""
+
 class Agent:
     """Base Agent class with Gemini integration"""
     
     def __init__(self, role: AgentRole, system_prompt: str):
         self.role = role
+        self._role_name = role.value
         self.system_prompt = system_prompt
         self.status = "idle"
-        # Initialize Gemini only if API key is available
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
-            self.model = genai.GenerativeModel(
-                'gemini-2.0-flash',
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "max_output_tokens": 8192,
-                }
-            )
-        else:
-            self.model = None
+        # Static head of every prompt for this role, built once
+        self._prompt_prefix = f"""You are a {role.value} in an autonomous software development team.
+
+SYSTEM CONTEXT:
+{system_prompt}
+
+SHARED TEAM MEMORY:
+"""
     
-    async def execute(self, project_id: str, task: str, context: Dict) -> TaskResult:
-        """Execute a task using Gemini"""
-        if not self.model:
+    async def execute(self, project_id: str, task: str, context: Dict,
+                      db: Optional[Session] = None) -> TaskResult:
+        """Execute a task using Gemini
+
+        The caller may pass in its session; otherwise one is opened for
+        the duration of the task and returned to the pool afterwards.
+        Blocking DB and Gemini calls run in worker threads so the event
+        loop keeps serving other requests meanwhile.
+        """
+        if not SHARED_MODEL:
             return TaskResult(
                 success=False,
                 output="Gemini API key not configured",
@@ -236,112 +796,24 @@ class Agent:
                 next_steps=[]
             )
             
-        self.status = "working"
-        db = SessionLocal()
+        await asyncio.to_thread(self.set_status, project_id, "working")
+        owns_session = db is None
+        if owns_session:
+            db = SessionLocal()
         
         try:
-            # Get shared memory
-            shared_memory = db.query(SharedMemory).filter_by(project_id=project_id).all()
-            memory_dict = {sm.key: sm.value for sm in shared_memory}
-            
-            # Build prompt
-            prompt = f"""You are a {self.role.value} in an autonomous software development team.
-
-SYSTEM CONTEXT:
-{self.system_prompt}
-
-SHARED TEAM MEMORY:
-{json.dumps(memory_dict, indent=2)}
-
-CURRENT TASK:
-{task}
+            prompt = await asyncio.to_thread(self._build_prompt, db, project_id, task, context)
 
-ADDITIONAL CONTEXT:
-{json.dumps(context, indent=2)}
-
-CRITICAL: Respond with ONLY a valid JSON object in this EXACT format:
-{{
-    "reasoning": "your detailed thought process and approach",
-    "output": "your main deliverable (description, code, design, etc)",
-    "files": {{
-        "/path/to/file.ext": "complete file content here"
-    }},
-    "shared_memory_updates": {{
-        "key_name": "value to share with team"
-    }},
-    "next_steps": ["recommended next step"],
-    "blockers": []
-}}
-
-Generate complete, production-ready code. No placeholders, no TODOs."""
-
-            # Call Gemini
-            response = self.model.generate_content(prompt)
-            text = response.text
+            # Call Gemini off the event loop so concurrent phases overlap
+            text = await asyncio.to_thread(self._generate, prompt)
             
-            # Extract JSON from response
+            # JSON mode makes this a single orjson.loads; the text scanning
+            # fallbacks only run for a truncated or otherwise malformed reply
             result = extract_json_from_text(text)
             
-            # Update shared memory
-            if "shared_memory_updates" in result and result["shared_memory_updates"]:
-                for key, value in result["shared_memory_updates"].items():
-                    existing = db.query(SharedMemory).filter_by(
-                        project_id=project_id, key=key
-                    ).first()
-                    
-                    if existing:
-                        existing.value = value
-                        existing.updated_at = datetime.utcnow()
-                    else:
-                        new_mem = SharedMemory(
-                            project_id=project_id,
-                            key=key,
-                            value=value
-                        )
-                        db.add(new_mem)
-                
-                db.commit()
-            
-            # Save generated files
-            if "files" in result and result["files"]:
-                for file_path, content in result["files"].items():
-                    # Ensure path starts with /
-                    if not file_path.startswith('/'):
-                        file_path = '/' + file_path
-                    
-                    existing_file = db.query(ProjectFile).filter_by(
-                        project_id=project_id, file_path=file_path
-                    ).first()
-                    
-                    if existing_file:
-                        existing_file.content = content
-                        existing_file.size = len(content)
-                        existing_file.updated_at = datetime.utcnow()
-                    else:
-                        new_file = ProjectFile(
-                            project_id=project_id,
-                            file_path=file_path,
-                            content=content,
-                            size=len(content)
-                        )
-                        db.add(new_file)
-                
-                db.commit()
-            
-            # Log success
-            output_preview = result.get('output', 'Task completed')[:200]
-            log = AgentLog(
-                project_id=project_id,
-                agent_name=self.role.value,
-                level="success",
-                message=f"✅ Completed: {output_preview}",
-                # Updated to use log_metadata
-                log_metadata={"task": task[:200]} 
-                )
-            db.add(log)
-            db.commit()
+            await asyncio.to_thread(self._save_result, db, project_id, task, result)
             
-            self.status = "idle"
+            await asyncio.to_thread(self.set_status, project_id, "idle")
             
             return TaskResult(
                 success=True,
@@ -351,19 +823,8 @@ Generate complete, production-ready code. No placeholders, no TODOs."""
             )
             
         except Exception as e:
-            self.status = "error"
-            
-            # Log error
-            log = AgentLog(
-                project_id=project_id,
-                agent_name=self.role.value,
-                level="error",
-                message=f"❌ Error: {str(e)}",
-                # Updated to use log_metadata
-                log_metadata={"task": task[:200], "error": str(e)}
-            )
-            db.add(log)
-            db.commit()
+            await asyncio.to_thread(self.set_status, project_id, "error")
+            await asyncio.to_thread(self._save_error, db, project_id, task, e)
             
             return TaskResult(
                 success=False,
@@ -372,7 +833,128 @@ Generate complete, production-ready code. No placeholders, no TODOs."""
                 next_steps=[]
             )
         finally:
-            db.close()
+            if owns_session:
+                db.close()
+
+    def _build_prompt(self, db: Session, project_id: str, task: str, context: Dict) -> str:
+        """Assemble the prompt from the shared memory this role consumes"""
+        memory = load_shared_memory(db, project_id)
+        sources = MEMORY_SOURCES.get(self.role)
+        memory_dict = {
+            key: value
+            for key, (agent_name, value) in memory.items()
+            if sources is None or agent_name is None
+            or agent_name == self._role_name or agent_name in sources
+        }
+        
+        # Build prompt around the precomputed static parts
+        context_block = (
+            f"\n\nADDITIONAL CONTEXT:\n{orjson.dumps(context).decode()}"
+            if context else ""
+        )
+        return (
+            self._prompt_prefix
+            + format_shared_memory(memory_dict)
+            + "\n\nCURRENT TASK:\n" + task
+            + context_block
+            + RESPONSE_FORMAT_INSTRUCTIONS
+        )
+
+    def _save_result(self, db: Session, project_id: str, task: str, result: Dict):
+        """Persist memory updates, files and the success log in one commit"""
+        now = datetime.utcnow()
+        
+        # Update shared memory with one executemany upsert
+        memory_updates = result.get("shared_memory_updates")
+        if memory_updates:
+            db.execute(SHARED_MEMORY_UPSERT, [
+                {
+                    "project_id": project_id,
+                    "key": key,
+                    "value": value,
+                    "agent_name": self._role_name,
+                    "updated_at": now
+                }
+                for key, value in memory_updates.items()
+            ])
+        
+        # Save generated files with one executemany upsert
+        if "files" in result and result["files"]:
+            files = {
+                normalize_file_path(path): content
+                for path, content in result["files"].items()
+            }
+            db.execute(PROJECT_FILE_UPSERT, [
+                {
+                    "project_id": project_id,
+                    "file_path": file_path,
+                    "content": content,
+                    "content_sha256": content_digest(content),
+                    "updated_at": now
+                }
+                for file_path, content in files.items()
+            ])
+        
+        # Log success
+        output_preview = result.get('output', 'Task completed')[:200]
+        log = AgentLog(
+            project_id=project_id,
+            agent_name=self._role_name,
+            level="success",
+            message=f"✅ Completed: {output_preview}",
+            # Updated to use log_metadata
+            log_metadata={"task": task[:200]},
+            created_at=now
+            )
+        event = log_event(log)
+        db.add(log)
+        # Memory, files and log land in a single transaction
+        db.commit()
+        if memory_updates:
+            update_shared_memory_cache(project_id, self._role_name, memory_updates)
+        if result.get("files"):
+            invalidate_response_cache(project_id)
+        publish_event(project_id, event)
+
+    def _save_error(self, db: Session, project_id: str, task: str, error: Exception):
+        """Record a failed task in the agent log"""
+        # Discard whatever the failed step left pending so the session
+        # (possibly the caller's) can still write the error log
+        db.rollback()
+        
+        # Log error
+        log = AgentLog(
+            project_id=project_id,
+            agent_name=self._role_name,
+            level="error",
+            message=f"❌ Error: {str(error)}",
+            # Updated to use log_metadata
+            log_metadata={"task": task[:200], "error": str(error)},
+            created_at=datetime.utcnow()
+        )
+        event = log_event(log)
+        db.add(log)
+        try:
+            db.commit()
+        except IntegrityError:
+            # The project is gone; the failed TaskResult still reports the error
+            db.rollback()
+            print(f"⚠️ Could not log error for unknown project {project_id}")
+            return
+        publish_event(project_id, event)
+
+    def set_status(self, project_id: str, status: str):
+        """Record status for this worker and, via Redis, for the whole cluster"""
+        self.status = status
+        set_agent_status(project_id, self._role_name, status)
+    
+    def _generate(self, prompt: str) -> str:
+        """Stream the Gemini response, returning as soon as the JSON object is complete"""
+        scanner = JsonStreamScanner()
+        for chunk in SHARED_MODEL.generate_content(prompt, stream=True):
+            if scanner.feed("".join(part.text for part in chunk.parts)):
+                break
+        return scanner.getvalue()
 
 # Agent implementations (same as before)
 class ProductManagerAgent(Agent):
@@ -544,120 +1126,191 @@ Focus on usability, accessibility, and beautiful design."""
 # ORCHESTRATOR
 # ============================================
 
+# One instance per role for the whole process; the agents only hold the
+# role's static prompt and last-known status, so every orchestrator shares them
+AGENTS = {
+    AgentRole.PRODUCT_MANAGER: ProductManagerAgent(),
+    AgentRole.SYSTEM_ARCHITECT: SystemArchitectAgent(),
+    AgentRole.BACKEND_ENGINEER: BackendEngineerAgent(),
+    AgentRole.FRONTEND_ENGINEER: FrontendEngineerAgent(),
+    AgentRole.DATABASE_ENGINEER: DatabaseEngineerAgent(),
+    AgentRole.QA_ENGINEER: QAEngineerAgent(),
+    AgentRole.DEVOPS_ENGINEER: DevOpsEngineerAgent(),
+    AgentRole.SECURITY_ENGINEER: SecurityEngineerAgent(),
+    AgentRole.MOBILE_ENGINEER: MobileEngineerAgent(),
+    AgentRole.ML_ENGINEER: MLEngineerAgent(),
+    AgentRole.DOCUMENTATION_SPECIALIST: DocumentationSpecialistAgent(),
+    AgentRole.UX_DESIGNER: UXDesignerAgent(),
+}
+
 class Orchestrator:
     """Coordinates all agents to build complete software projects"""
     
     def __init__(self):
-        self.agents = {
-            AgentRole.PRODUCT_MANAGER: ProductManagerAgent(),
-            AgentRole.SYSTEM_ARCHITECT: SystemArchitectAgent(),
-            AgentRole.BACKEND_ENGINEER: BackendEngineerAgent(),
-            AgentRole.FRONTEND_ENGINEER: FrontendEngineerAgent(),
-            AgentRole.DATABASE_ENGINEER: DatabaseEngineerAgent(),
-            AgentRole.QA_ENGINEER: QAEngineerAgent(),
-            AgentRole.DEVOPS_ENGINEER: DevOpsEngineerAgent(),
-            AgentRole.SECURITY_ENGINEER: SecurityEngineerAgent(),
-            AgentRole.MOBILE_ENGINEER: MobileEngineerAgent(),
-            AgentRole.ML_ENGINEER: MLEngineerAgent(),
-            AgentRole.DOCUMENTATION_SPECIALIST: DocumentationSpecialistAgent(),
-            AgentRole.UX_DESIGNER: UXDesignerAgent(),
-        }
+        self.agents = AGENTS
     
     async def execute_workflow(self, project_id: str, description: str):
         """Execute complete software development workflow"""
         
-        db = SessionLocal()
-        
         try:
             # Update project status
-            project = db.query(Project).filter_by(id=project_id).first()
-            if not project:
+            if not await asyncio.to_thread(self._set_project_status, project_id, "running"):
                 raise Exception("Project not found")
             
-            project.status = "running"
-            db.commit()
-            
             # Log start
             await self._log(project_id, "Orchestrator", "🚀 Starting autonomous development workflow")
             
-            # Execute phases
-            phases = [
-                (AgentRole.PRODUCT_MANAGER, "📋 Analyzing requirements...", 
-                 f"Analyze this project and create detailed requirements:\n{description}"),
-                (AgentRole.UX_DESIGNER, "🎨 Designing user experience...",
-                 "Design the user experience, user flows, and UI mockups based on requirements"),
-                (AgentRole.SYSTEM_ARCHITECT, "🏗️ Designing system architecture...",
-                 "Design complete system architecture including tech stack, API design, and component structure"),
-                (AgentRole.DATABASE_ENGINEER, "🗄️ Designing database schema...",
-                 "Design the database schema, relationships, indexes, and migrations"),
-                (AgentRole.BACKEND_ENGINEER, "⚙️ Implementing backend...",
-                 "Implement the complete backend with APIs, business logic, authentication, and database integration"),
-                (AgentRole.FRONTEND_ENGINEER, "💻 Building frontend...",
-                 "Implement the complete frontend with React components, state management, API integration, and routing"),
-                (AgentRole.SECURITY_ENGINEER, "🔒 Security review...",
-                 "Review code for security vulnerabilities and implement security best practices"),
-                (AgentRole.QA_ENGINEER, "🧪 Writing tests...",
-                 "Create comprehensive test suites including unit, integration, and E2E tests"),
-                (AgentRole.DEVOPS_ENGINEER, "🚀 Setting up deployment...",
-                 "Create Docker configuration, CI/CD pipeline, and deployment documentation"),
-                (AgentRole.DOCUMENTATION_SPECIALIST, "📚 Writing documentation...",
-                 "Create comprehensive documentation including README, API docs, and setup guides"),
+            # Execute phases in waves: each wave only depends on the shared
+            # memory written by earlier waves, so agents within a wave run
+            # concurrently (each on its own pooled session)
+            waves = [
+                [
+                    (AgentRole.PRODUCT_MANAGER, "📋 Analyzing requirements...", 
+                     f"Analyze this project and create detailed requirements:\n{description}"),
+                ],
+                [
+                    (AgentRole.UX_DESIGNER, "🎨 Designing user experience...",
+                     "Design the user experience, user flows, and UI mockups based on requirements"),
+                    (AgentRole.SYSTEM_ARCHITECT, "🏗️ Designing system architecture...",
+                     "Design complete system architecture including tech stack, API design, and component structure"),
+                ],
+                [
+                    (AgentRole.DATABASE_ENGINEER, "🗄️ Designing database schema...",
+                     "Design the database schema, relationships, indexes, and migrations"),
+                ],
+                [
+                    (AgentRole.BACKEND_ENGINEER, "⚙️ Implementing backend...",
+                     "Implement the complete backend with APIs, business logic, authentication, and database integration"),
+                ],
+                [
+                    (AgentRole.FRONTEND_ENGINEER, "💻 Building frontend...",
+                     "Implement the complete frontend with React components, state management, API integration, and routing"),
+                ],
+                [
+                    (AgentRole.SECURITY_ENGINEER, "🔒 Security review...",
+                     "Review code for security vulnerabilities and implement security best practices"),
+                    (AgentRole.QA_ENGINEER, "🧪 Writing tests...",
+                     "Create comprehensive test suites including unit, integration, and E2E tests"),
+                    (AgentRole.DOCUMENTATION_SPECIALIST, "📚 Writing documentation...",
+                     "Create comprehensive documentation including README, API docs, and setup guides"),
+                ],
+                [
+                    # Deployment config goes last so it can pick up the
+                    # security review and test setup from the wave above
+                    (AgentRole.DEVOPS_ENGINEER, "🚀 Setting up deployment...",
+                     "Create Docker configuration, CI/CD pipeline, and deployment documentation"),
+                ],
             ]
             
-            for role, log_msg, task in phases:
-                await self._log(project_id, role.value, log_msg)
-                result = await self.agents[role].execute(project_id, task, {})
+            for wave in waves:
+                for role, log_msg, _ in wave:
+                    await self._log(project_id, role.value, log_msg)
                 
-                if not result.success:
-                    raise Exception(f"{role.value} phase failed")
-            
-            # Complete
-            project.status = "completed"
-            db.commit()
+                results = await asyncio.gather(*(
+                    self.agents[role].execute(project_id, task, {})
+                    for role, _, task in wave
+                ))
+                
+                for (role, _, _), result in zip(wave, results):
+                    if not result.success:
+                        raise Exception(f"{role.value} phase failed")
             
+            # Complete. The UI stops polling once it sees the final status,
+            # so the last log line must be in the database before it
             await self._log(project_id, "Orchestrator", "✅ Project generation completed successfully!")
+            await flush_log_queue()
+            await asyncio.to_thread(self._set_project_status, project_id, "completed")
             
         except Exception as e:
-            project = db.query(Project).filter_by(id=project_id).first()
-            if project:
-                project.status = "failed"
-                db.commit()
-            
             await self._log(project_id, "Orchestrator", f"❌ Workflow failed: {str(e)}")
+            await flush_log_queue()
+            await asyncio.to_thread(self._set_project_status, project_id, "failed")
             raise e
-        finally:
-            db.close()
+    
+    def _set_project_status(self, project_id: str, status: str) -> bool:
+        """Commit a project's status and notify listeners; False if it doesn't exist
+
+        Runs in a worker thread: the DB commit and the Redis calls all block.
+        """
+        with SessionLocal() as db:
+            project = db.query(Project).filter_by(id=project_id).first()
+            if not project:
+                return False
+            project.status = status
+            db.commit()
+        invalidate_response_cache(project_id)
+        publish_event(project_id, {"type": "status", "status": status})
+        return True
     
     async def _log(self, project_id: str, agent: str, message: str):
         """Helper to log messages"""
-        db = SessionLocal()
-        try:
-            log = AgentLog(
-                project_id=project_id,
-                agent_name=agent,
-                level="info",
-                message=message,
-                log_metadata={}
-            )
-            db.add(log)
-            db.commit()
-        finally:
-            db.close()
+        await enqueue_log(AgentLog(
+            project_id=project_id,
+            agent_name=agent,
+            level="info",
+            message=message,
+            log_metadata={},
+            created_at=datetime.utcnow()
+        ))
 
 # ============================================
 # FASTAPI APP
 # ============================================
 
-app = FastAPI(title="NexusForge API", version="1.0.0")
+def warm_db_pool(size: int = 5):
+    """Open pooled connections up front so early requests skip the connect cost"""
+    conns = [engine.connect() for _ in range(size)]
+    for conn in conns:
+        conn.execute(text("SELECT 1"))
+        conn.close()
+
+arq_pool = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global arq_pool
+    try:
+        await asyncio.to_thread(warm_db_pool)
+    except Exception as e:
+        print(f"⚠️ Database pool warm-up failed: {e}")
+    if BUILD_QUEUE == "arq":
+        try:
+            arq_pool = await create_pool(RedisSettings.from_dsn(REDIS_URL))
+            print("✅ Build queue connected")
+        except Exception as e:
+            print(f"⚠️ Build queue unavailable, running builds in-process: {e}")
+    await start_log_writer()
+    yield
+    await stop_log_writer()
+    if arq_pool:
+        await arq_pool.close()
+
+# Handlers that touch the database are plain `def` so FastAPI runs them in
+# its threadpool instead of blocking the event loop on SQLite I/O
+app = FastAPI(
+    title="NexusForge API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+# Comma-separated list, e.g. CORS_ORIGINS=https://app.example.com; the
+# frontend sends no cookies, so credentials stay off
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    # Let browsers reuse a preflight for a day
+    max_age=86400,
 )
 
+# Generated source compresses well; small responses aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 orchestrator = Orchestrator()
 
 @app.get("/")
@@ -668,17 +1321,16 @@ async def root():
 async def health():
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
         "agents": len(orchestrator.agents),
         "database": "connected",
         "redis": "connected" if redis_client else "disconnected"
     }
 
 @app.post("/api/projects")
-async def create_project(project: ProjectCreate, background_tasks: BackgroundTasks):
+def create_project(project: ProjectCreate, background_tasks: BackgroundTasks,
+                   db: Session = Depends(get_db)):
     """Create a new project"""
-    db = SessionLocal()
-    
     try:
         project_id = str(uuid.uuid4())
         new_project = Project(
@@ -705,102 +1357,151 @@ async def create_project(project: ProjectCreate, background_tasks: BackgroundTas
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 @app.post("/api/projects/{project_id}/build")
-async def start_build(project_id: str, background_tasks: BackgroundTasks):
+def start_build(project_id: str, background_tasks: BackgroundTasks,
+                db: Session = Depends(get_db)):
     """Start autonomous build process"""
-    db = SessionLocal()
+    # Only the description is needed to kick off the workflow
+    description = db.query(Project.description).filter_by(id=project_id).scalar()
     
-    try:
-        project = db.query(Project).filter_by(id=project_id).first()
-        
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Run workflow in background
+    if description is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    invalidate_response_cache(project_id)
+    
+    # Run workflow on a build worker, or in the background of this one
+    if arq_pool:
+        anyio.from_thread.run(
+            arq_pool.enqueue_job,
+            "execute_workflow_task",
+            project_id,
+            description
+        )
+    else:
         background_tasks.add_task(
             orchestrator.execute_workflow,
             project_id,
-            project.description
+            description
         )
-        
-        return {"success": True, "message": "Build started"}
-    finally:
-        db.close()
+    
+    return {"success": True, "message": "Build started"}
 
 @app.get("/api/projects/{project_id}")
-async def get_project(project_id: str):
-    """Get project details"""
-    db = SessionLocal()
+def get_project(project_id: str, include: Optional[str] = None, db: Session = Depends(get_db)):
+    """Get project details
+
+    File contents are only included with ?include=files; otherwise use the
+    /files listing and fetch individual files as needed.
+    """
+    cache_field = "project:files" if include == "files" else "project"
+    cache_key = response_cache_key(project_id)
+    cached = get_cached_response(cache_key, cache_field)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
     
-    try:
-        project = db.query(Project).filter_by(id=project_id).first()
-        
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Get files
-        files = db.query(ProjectFile).filter_by(project_id=project_id).all()
-        file_list = {f.file_path: f.content for f in files}
-        
-        return {
-            "id": project.id,
-            "name": project.name,
-            "description": project.description,
-            "status": project.status,
-            "created_at": project.created_at.isoformat(),
-            "updated_at": project.updated_at.isoformat(),
-            "files": file_list
-        }
-    finally:
-        db.close()
+    project = db.query(Project).filter_by(id=project_id).first()
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    response = {
+        "id": project.id,
+        "name": project.name,
+        "description": project.description,
+        "status": project.status,
+        "created_at": project.created_at,
+        "updated_at": project.updated_at
+    }
+    
+    if include == "files":
+        # Rows are (file_path, content) pairs, so dict() builds the mapping
+        # without per-row attribute lookups
+        response["files"] = dict(
+            db.query(ProjectFile.file_path, ProjectFile.content).filter_by(
+                project_id=project_id
+            ).all()
+        )
+    
+    body = orjson.dumps(response)
+    cache_response(cache_key, {cache_field: body})
+    return Response(content=body, media_type="application/json")
 
 @app.get("/api/projects/{project_id}/logs")
-async def get_logs(project_id: str):
+def get_logs(project_id: str, db: Session = Depends(get_db)):
     """Get project logs"""
-    db = SessionLocal()
+    logs = db.query(AgentLog).filter_by(project_id=project_id).order_by(AgentLog.created_at.desc()).limit(100).all()
     
-    try:
-        logs = db.query(AgentLog).filter_by(project_id=project_id).order_by(AgentLog.created_at.desc()).limit(100).all()
-        
-        return {
-            "logs": [
-                {
-                    "timestamp": log.created_at.isoformat(),
-                    "agent": log.agent_name,
-                    "level": log.level,
-                    "message": log.message
-                }
-                for log in reversed(logs)
-            ]
-        }
-    finally:
-        db.close()
+    # Returned as a response object so orjson serializes the datetimes
+    # directly instead of FastAPI walking every entry with jsonable_encoder
+    return ORJSONResponse({
+        "logs": [
+            {
+                "timestamp": log.created_at,
+                "agent": log.agent_name,
+                "level": log.level,
+                "message": log.message
+            }
+            for log in reversed(logs)
+        ]
+    })
 
 @app.get("/api/projects/{project_id}/files")
-async def list_files(project_id: str):
+def list_files(project_id: str, db: Session = Depends(get_db)):
     """List all project files"""
-    db = SessionLocal()
+    cache_key = response_cache_key(project_id)
+    cached = get_cached_response(cache_key, "files")
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
     
-    try:
-        files = db.query(ProjectFile).filter_by(project_id=project_id).all()
-        return {"files": [f.file_path for f in files]}
-    finally:
-        db.close()
+    files = db.query(ProjectFile.file_path).filter_by(project_id=project_id).all()
+    body = orjson.dumps({"files": [f.file_path for f in files]})
+    cache_response(cache_key, {"files": body})
+    return Response(content=body, media_type="application/json")
+
+# Configuration and test files left out of the project file view
+CONFIG_PATTERNS = ('Dockerfile', 'docker-compose', '.yml', '.yaml',
+                   'package.json', 'requirements.txt', '.config.js',
+                   '.gitignore', '.env', 'alembic', 'migrations',
+                   'tests/', '.test.', 'spec.', 'e2e/')
+
+# Built once; the clause is immutable and safe to reuse across requests.
+# instr() rather than LIKE: SQLite's LIKE ignores ASCII case, and the match
+# must stay case-sensitive ("Tests/" is not "tests/")
+NOT_CONFIG_FILE = not_(or_(*(
+    func.instr(ProjectFile.file_path, pattern) > 0
+    for pattern in CONFIG_PATTERNS
+)))
+
+# Registered before get_file so "project" isn't taken as a file path
+@app.get("/api/projects/{project_id}/files/project")
+def get_project_files(project_id: str, db: Session = Depends(get_db)):
+    """Get only project files (filter out config/test files)"""
+    files = db.query(ProjectFile.file_path).filter(
+        ProjectFile.project_id == project_id,
+        NOT_CONFIG_FILE
+    ).all()
+    return {"files": [f.file_path for f in files]}
 
 @app.get("/api/projects/{project_id}/files/{file_path:path}")
-async def get_file(project_id: str, file_path: str):
-    """Get file content"""
-    db = SessionLocal()
+def get_file(project_id: str, file_path: str, request: Request, db: Session = Depends(get_db)):
+    """Get file content as a raw text stream
+
+    The ETag is the content hash, so clients revalidating with
+    If-None-Match get a 304 without the body being loaded.
+    """
+    file_path = normalize_file_path(file_path)
+    if_none_match = request.headers.get("if-none-match")
+    content_field, etag_field = f"file:{file_path}", f"etag:{file_path}"
     
-    try:
-        # Ensure path starts with /
-        if not file_path.startswith('/'):
-            file_path = '/' + file_path
-        
-        file = db.query(ProjectFile).filter_by(
+    cache_key = response_cache_key(project_id)
+    etag = get_cached_response(cache_key, etag_field)
+    if etag is not None and if_none_match == f'"{etag}"':
+        return Response(status_code=304, headers={"ETag": if_none_match})
+    
+    content = get_cached_response(cache_key, content_field) if etag is not None else None
+    if content is None:
+        file = db.query(ProjectFile.content, ProjectFile.content_sha256).filter_by(
             project_id=project_id,
             file_path=file_path
         ).first()
@@ -808,86 +1509,166 @@ async def get_file(project_id: str, file_path: str):
         if not file:
             raise HTTPException(status_code=404, detail="File not found")
         
-        return {
-            "path": file.file_path,
-            "content": file.content,
-            "size": file.size
-        }
-    finally:
-        db.close()
+        content = file.content or ""
+        # Rows written before hashes were stored get one computed here
+        etag = file.content_sha256 or content_digest(content)
+        cache_response(cache_key, {content_field: content, etag_field: etag})
+        if if_none_match == f'"{etag}"':
+            return Response(status_code=304, headers={"ETag": if_none_match})
+    
+    # no-cache: files change during a build, so always revalidate (cheaply)
+    return StreamingResponse(
+        iter_chunks(content),
+        media_type="text/plain",
+        headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    )
+
+@app.get("/api/projects/{project_id}/file-info/{file_path:path}")
+def get_file_info(project_id: str, file_path: str, db: Session = Depends(get_db)):
+    """Get file metadata without its content"""
+    file_path = normalize_file_path(file_path)
+    
+    file = db.query(
+        ProjectFile.file_path,
+        func.length(ProjectFile.content).label("size"),
+        ProjectFile.content_sha256,
+        ProjectFile.created_at,
+        ProjectFile.updated_at
+    ).filter_by(project_id=project_id, file_path=file_path).first()
+    
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return {
+        "path": file.file_path,
+        "size": file.size or 0,
+        "sha256": file.content_sha256,
+        "created_at": file.created_at,
+        "updated_at": file.updated_at
+    }
 
 @app.post("/api/projects/{project_id}/files")
-async def create_file(project_id: str, file: FileCreate):
+def create_file(project_id: str, file: FileCreate, db: Session = Depends(get_db)):
     """Create or update a file"""
-    db = SessionLocal()
-    
     try:
-        # Ensure path starts with /
-        file_path = file.path if file.path.startswith('/') else '/' + file.path
-        
-        existing = db.query(ProjectFile).filter_by(
-            project_id=project_id,
-            file_path=file_path
-        ).first()
-        
-        if existing:
-            existing.content = file.content
-            existing.size = len(file.content)
-            existing.updated_at = datetime.utcnow()
-        else:
-            new_file = ProjectFile(
-                project_id=project_id,
-                file_path=file_path,
-                content=file.content,
-                size=len(file.content)
-            )
-            db.add(new_file)
-        
+        # One statement, no read; unchanged content is left as is
+        db.execute(PROJECT_FILE_UPSERT, {
+            "project_id": project_id,
+            "file_path": file.path,
+            "content": file.content,
+            "content_sha256": content_digest(file.content),
+            "updated_at": datetime.utcnow()
+        })
         db.commit()
-        return {"success": True, "path": file_path}
+        invalidate_response_cache(project_id)
+        return {"success": True, "path": file.path}
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Project not found")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
-        
-@app.get("/api/projects/{project_id}/files/project")
-async def get_project_files(project_id: str):
-    """Get only project files (filter out config/test files)"""
-    db = SessionLocal()
-    
-    try:
-        all_files = db.query(ProjectFile).filter_by(project_id=project_id).all()
-        
-        # Filter out configuration and test files
-        project_files = []
-        config_patterns = ['Dockerfile', 'docker-compose', '.yml', '.yaml', 
-                          'package.json', 'requirements.txt', '.config.js',
-                          '.gitignore', '.env', 'alembic', 'migrations',
-                          'tests/', '.test.', 'spec.', 'e2e/']
-        
-        for file in all_files:
-            if not any(pattern in file.file_path for pattern in config_patterns):
-                project_files.append(file)
-        
-        return {"files": [f.file_path for f in project_files]}
-    finally:
-        db.close()
 
 @app.get("/api/agents/status")
-async def get_agent_status():
-    """Get status of all agents"""
+def get_agent_status(project_id: Optional[str] = None):
+    """Get status of all agents
+
+    With project_id the statuses come from Redis and cover every worker;
+    without it, this worker's last known status per agent is returned.
+    """
+    if project_id:
+        if not redis_client:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        statuses = redis_client.hgetall(agent_status_key(project_id))
+    else:
+        statuses = {role.value: agent.status for role, agent in orchestrator.agents.items()}
+    
     return {
         "agents": {
             role.value: {
-                "status": agent.status,
+                "status": statuses.get(role.value, "idle"),
                 "role": role.value
             }
-            for role, agent in orchestrator.agents.items()
+            for role in orchestrator.agents
         }
     }
 
 
+@app.websocket("/ws/projects/{project_id}")
+async def project_events(websocket: WebSocket, project_id: str):
+    """Push log and status events for a project instead of polling"""
+    await websocket.accept()
+    if not redis_async:
+        await websocket.close(code=1011, reason="Redis not available")
+        return
+    
+    pubsub = redis_async.pubsub()
+    await pubsub.subscribe(project_channel(project_id))
+    
+    # If the client reads slower than events arrive, keep a bounded backlog
+    # of logs and only the most recent status update
+    pending_logs = deque(maxlen=500)
+    latest_status = None
+    ready = asyncio.Event()
+    
+    async def receive_events():
+        nonlocal latest_status
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            if orjson.loads(message["data"]).get("type") == "status":
+                latest_status = message["data"]
+            else:
+                pending_logs.append(message["data"])
+            ready.set()
+    
+    async def send_events():
+        nonlocal latest_status
+        while True:
+            await ready.wait()
+            ready.clear()
+            while pending_logs:
+                await websocket.send_text(pending_logs.popleft())
+            if latest_status is not None:
+                status, latest_status = latest_status, None
+                await websocket.send_text(status)
+    
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+    
+    tasks = [
+        asyncio.create_task(receive_events()),
+        asyncio.create_task(send_events()),
+        asyncio.create_task(wait_for_disconnect()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await pubsub.unsubscribe(project_channel(project_id))
+        await pubsub.close()
+
+
+# ============================================
+# BUILD WORKER
+# ============================================
+
+async def execute_workflow_task(ctx, project_id: str, description: str):
+    await orchestrator.execute_workflow(project_id, description)
+
+class WorkerSettings:
+    """arq worker for BUILD_QUEUE=arq; run with `arq main.WorkerSettings`"""
+    functions = [execute_workflow_task]
+    on_startup = start_log_writer
+    on_shutdown = stop_log_writer
+    redis_settings = RedisSettings.from_dsn(REDIS_URL)
+    # A full build is a dozen sequential-ish LLM calls
+    job_timeout = 3600
 
 if __name__ == "__main__":
     import uvicorn
@@ -901,4 +1682,17 @@ if __name__ == "__main__":
     
 
     
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    # One process by default: this entry point is for local development on
+    # a SQLite file. Deployments opt in to more via WEB_CONCURRENCY, which
+    # needs an import string rather than the app object
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        "main:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=8000,
+        # loop/http stay "auto": uvloop and httptools are used when installed
+        # (they aren't on Windows or without uvicorn[standard]); the Docker
+        # image pins them explicitly
+        workers=workers,
+        log_level="info"
+    )
\ No newline at end of file
@@ -12,7 +12,7 @@ from datetime import datetime
 sys.path.append('.')
 
 try:
-    from main import SessionLocal, Project, ProjectFile, AgentLog, Orchestrator
+    from main import SessionLocal, Project, ProjectFile, AgentLog, SharedMemory, orchestrator
 except ImportError as e:
     print(f"❌ Import error: {e}")
     print("💡 Make sure you're running this from the backend directory")
@@ -26,9 +26,12 @@ async def test_agents():
     db = SessionLocal()
     try:
         # Clean up any existing test project first
-        db.query(ProjectFile).filter(ProjectFile.project_id.like("test-project-%")).delete()
-        db.query(AgentLog).filter(AgentLog.project_id.like("test-project-%")).delete()
-        db.query(Project).filter(Project.id.like("test-project-%")).delete()
+        # Children first, all in one transaction; databases created before the
+        # foreign keys existed have no ON DELETE CASCADE to rely on
+        db.query(ProjectFile).filter(ProjectFile.project_id.like("test-project-%")).delete(synchronize_session=False)
+        db.query(AgentLog).filter(AgentLog.project_id.like("test-project-%")).delete(synchronize_session=False)
+        db.query(SharedMemory).filter(SharedMemory.project_id.like("test-project-%")).delete(synchronize_session=False)
+        db.query(Project).filter(Project.id.like("test-project-%")).delete(synchronize_session=False)
         db.commit()
         
         # Create new test project with timestamp for uniqueness
@@ -44,9 +47,6 @@ async def test_agents():
         
         print(f"✅ Test project created: {test_id}")
         
-        # Initialize orchestrator
-        orchestrator = Orchestrator()
-        
         print("🚀 Starting agent tests...")
         
         # Test a few key agents (not all to save time)
@@ -55,23 +55,24 @@ async def test_agents():
             ("SystemArchitect", "Design system architecture")
         ]
         
-        for agent_name, task in test_agents_list:
+        # Agents are I/O-bound on the LLM, so run them together
+        results = await asyncio.gather(
+            *(orchestrator.agents[agent_name].execute(test_id, task, {})
+              for agent_name, task in test_agents_list),
+            return_exceptions=True
+        )
+        
+        for (agent_name, task), result in zip(test_agents_list, results):
             print(f"📋 Testing {agent_name}...")
-            try:
-                agent = orchestrator.agents[agent_name]
-                result = await agent.execute(
-                    test_id, 
-                    task,
-                    {}
-                )
-                print(f"   Result: {'✅ Success' if result.success else '❌ Failed'}")
-                if result.success:
-                    print(f"   Output: {result.output[:100]}...")
-                    print(f"   Files created: {len(result.files)}")
-                else:
-                    print(f"   Error: {result.output}")
-            except Exception as e:
-                print(f"   ❌ Agent error: {e}")
+            if isinstance(result, Exception):
+                print(f"   ❌ Agent error: {result}")
+                continue
+            print(f"   Result: {'✅ Success' if result.success else '❌ Failed'}")
+            if result.success:
+                print(f"   Output: {result.output[:100]}...")
+                print(f"   Files created: {len(result.files)}")
+            else:
+                print(f"   Error: {result.output}")
         
         # Check what was created
         files = db.query(ProjectFile).filter_by(project_id=test_id).all()
@@ -107,6 +108,7 @@ def quick_test():
             description="Quick database test"
         )
         db.add(project)
+        db.flush()
         
         # Create log
         log = AgentLog(
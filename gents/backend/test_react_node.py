@@ -10,7 +10,7 @@ from datetime import datetime
 
 sys.path.append('.')
 
-from main import SessionLocal, Project, ProjectFile, AgentLog, Orchestrator
+from main import SessionLocal, Project, ProjectFile, AgentLog, SharedMemory, orchestrator
 
 async def test_react_node_app():
     """Test building a React + Node.js todo app specifically"""
@@ -20,9 +20,12 @@ async def test_react_node_app():
     db = SessionLocal()
     try:
         # Clean up any existing test projects
-        db.query(ProjectFile).filter(ProjectFile.project_id.like("react-node-test-%")).delete()
-        db.query(AgentLog).filter(AgentLog.project_id.like("react-node-test-%")).delete()
-        db.query(Project).filter(Project.id.like("react-node-test-%")).delete()
+        # Children first, all in one transaction; databases created before the
+        # foreign keys existed have no ON DELETE CASCADE to rely on
+        db.query(ProjectFile).filter(ProjectFile.project_id.like("react-node-test-%")).delete(synchronize_session=False)
+        db.query(AgentLog).filter(AgentLog.project_id.like("react-node-test-%")).delete(synchronize_session=False)
+        db.query(SharedMemory).filter(SharedMemory.project_id.like("react-node-test-%")).delete(synchronize_session=False)
+        db.query(Project).filter(Project.id.like("react-node-test-%")).delete(synchronize_session=False)
         db.commit()
         
         # Create new test project with specific requirements
@@ -39,9 +42,6 @@ async def test_react_node_app():
         print(f"✅ Test project created: {test_id}")
         print("📋 Specific requirements: React frontend + Node.js backend")
         
-        # Initialize orchestrator
-        orchestrator = Orchestrator()
-        
         print("🚀 Starting specialized agent tests...")
         
         # Test key agents with specific focus
@@ -52,22 +52,27 @@ async def test_react_node_app():
             ("BackendEngineer", "Build Node.js Express API endpoints for todo CRUD operations")
         ]
         
-        for agent_name, task in test_agents:
+        # Agents are I/O-bound on the LLM, so run them together
+        results = await asyncio.gather(
+            *(orchestrator.agents[agent_name].execute(test_id, task, {})
+              for agent_name, task in test_agents),
+            return_exceptions=True
+        )
+        
+        for (agent_name, task), result in zip(test_agents, results):
             print(f"📋 Testing {agent_name}...")
-            try:
-                agent = orchestrator.agents[agent_name]
-                result = await agent.execute(test_id, task, {})
-                print(f"   Result: {'✅ Success' if result.success else '❌ Failed'}")
-                if result.success:
-                    print(f"   Output preview: {result.output[:100]}...")
-                    print(f"   Files created: {len(result.files)}")
-                    # Show file names
-                    for file_path in result.files.keys():
-                        print(f"      - {file_path}")
-                else:
-                    print(f"   Error: {result.output}")
-            except Exception as e:
-                print(f"   ❌ Agent error: {e}")
+            if isinstance(result, Exception):
+                print(f"   ❌ Agent error: {result}")
+                continue
+            print(f"   Result: {'✅ Success' if result.success else '❌ Failed'}")
+            if result.success:
+                print(f"   Output preview: {result.output[:100]}...")
+                print(f"   Files created: {len(result.files)}")
+                # Show file names
+                for file_path in result.files.keys():
+                    print(f"      - {file_path}")
+            else:
+                print(f"   Error: {result.output}")
         
         # Check final results
         files = db.query(ProjectFile).filter_by(project_id=test_id).all()
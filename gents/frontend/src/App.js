@@ -103,8 +103,8 @@ export default function NexusForge() {
     try {
       const cleanPath = filePath.startsWith('/') ? filePath.substring(1) : filePath;
       const response = await fetch(`${API_URL}/api/projects/${projectId}/files/${cleanPath}`);
-      const data = await response.json();
-      setFileContent(data.content || '');
+      const content = response.ok ? await response.text() : '';
+      setFileContent(content);
     } catch (error) {
       console.error('Error fetching file:', error);
       setFileContent('// Error loading file');